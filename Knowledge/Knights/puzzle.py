@@ -1,5 +1,10 @@
+import sys
+
 from logic import *
 
+# Pass --stats to report the work done by model_check
+stats = enable_stats() if "--stats" in sys.argv else None
+
 AKnight = Symbol("A is a Knight")
 AKnave = Symbol("A is a Knave")
 
@@ -11,7 +16,7 @@ CKnave = Symbol("C is a Knave")
 
 # Puzzle 0
 # A says "I am both a knight and a knave."
-knowledge0 = And(
+knowledge0 = KnowledgeBase(
     Or(AKnight,AKnave),
     Not(And(AKnight,AKnave))
 )
@@ -31,7 +36,7 @@ elif model_check(knowledge0,AS0):
 # Puzzle 1
 # A says "We are both knaves."
 # B says nothing.
-knowledge1 = And(
+knowledge1 = KnowledgeBase(
     # Include rules of the game
     Or(AKnight,AKnave),
     Or(BKnight,BKnave),
@@ -54,7 +59,7 @@ elif model_check(knowledge1,AS1):
 # Puzzle 2
 # A says "We are the same kind."
 # B says "We are of different kinds."
-knowledge2 = And(
+knowledge2 = KnowledgeBase(
     # Set game rules
     Or(AKnight,AKnave),
     Or(BKnight,BKnave),
@@ -90,7 +95,7 @@ elif model_check(knowledge2,BS2):
 # B says "A said 'I am a knave'."
 # B says "C is a knave."
 # C says "A is a knight."
-knowledge3 = And(
+knowledge3 = KnowledgeBase(
     # Set game rules
     Or(AKnave,AKnight),
     Or(BKnave,BKnight),
@@ -146,9 +151,12 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
+            entailed = entailed_literals(knowledge, symbols)
             for symbol in symbols:
-                if model_check(knowledge, symbol):
+                if entailed[symbol]:
                     print(f"    {symbol}")
+    if stats is not None:
+        print(stats)
 
 
 if __name__ == "__main__":
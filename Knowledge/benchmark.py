@@ -0,0 +1,257 @@
+"""
+Times every entailment engine in logic.py on the existing puzzles and on
+generated workloads, and writes the results to JSON.
+
+Besides the engines of model_check, which start from scratch on every
+query, times the knowledge prepared once per workload and then queried:
+compiled to a BDD with CompiledKnowledge, and loaded into the
+incremental solver of KnowledgeBase.
+
+Usage: python benchmark.py [--engines cdcl bdd ...] [--output results.json]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import runpy
+import sys
+import time
+import tracemalloc
+
+KNOWLEDGE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(KNOWLEDGE, "Knights"))
+
+import logic
+from logic import (And, CompiledKnowledge, Implication, KnowledgeBase, Not,
+                   Or, Symbol, disable_stats, enable_stats, model_check)
+
+# Engines whose cost grows exponentially are skipped past this many symbols
+SYMBOL_LIMITS = {
+    "enumerate": 12,
+    "bitmask": 16,
+    "compiled": 20,
+    "prune": 20,
+    "numpy": 24,
+    "parallel": 24,
+    "resolution": 16,
+    "bdd": 30,
+    "bdd-compiled": 30,
+}
+
+
+def incremental(knowledge):
+    """Returns knowledge loaded into a KnowledgeBase."""
+    conjuncts = (knowledge.conjuncts if isinstance(knowledge, And)
+                 else [knowledge])
+    return KnowledgeBase(*conjuncts)
+
+
+# Ways of preparing knowledge once to answer every query of a workload
+PREPARED = {
+    "bdd-compiled": CompiledKnowledge,
+    "cdcl-incremental": incremental,
+}
+
+
+def puzzle(path, knowledge, symbols):
+    """Runs an existing puzzle script and returns its knowledge and symbols."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        namespace = runpy.run_path(os.path.join(KNOWLEDGE, path))
+    if isinstance(symbols, list):
+        return namespace[knowledge], [namespace[name] for name in symbols]
+    return namespace[knowledge], namespace[symbols]
+
+
+def knights():
+    """Yields the four Knights and Knaves puzzles."""
+    names = ["AKnight", "AKnave", "BKnight", "BKnave", "CKnight", "CKnave"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        namespace = runpy.run_path(os.path.join(KNOWLEDGE, "Knights",
+                                                "puzzle.py"))
+    symbols = [namespace[name] for name in names]
+    for i in range(4):
+        yield f"knights{i}", namespace[f"knowledge{i}"], symbols
+
+
+def lectures():
+    """Yields the knowledge bases of the lecture examples."""
+    yield ("harry",) + puzzle("src1/src/harry.py", "knowledge",
+                              ["rain", "hagrid", "dumbledore"])
+    try:
+        yield ("clue",) + puzzle("src1/src/clue.py", "knowledge", "symbols")
+    except ImportError:
+        print("Skipping clue: termcolor is not installed")
+    yield ("mastermind",) + puzzle("src1/src/mastermind.py", "knowledge",
+                                   "symbols")
+    yield ("houses",) + puzzle("src1/src/puzzle.py", "knowledge", "symbols")
+
+
+def mastermind(colours, rng):
+    """Returns a Mastermind game with colours positions and a few guesses."""
+    def symbol(colour, position):
+        return Symbol(f"colour{colour}_{position}")
+
+    knowledge = And()
+    positions = range(colours)
+    for colour in range(colours):
+        knowledge.add(Or(*[symbol(colour, i) for i in positions]))
+        for i, j in itertools.permutations(positions, 2):
+            knowledge.add(Implication(symbol(colour, i),
+                                      Not(symbol(colour, j))))
+            knowledge.add(Implication(symbol(i, colour),
+                                      Not(symbol(j, colour))))
+
+    # Each guess is told how many of its colours are in the right place
+    secret = rng.sample(range(colours), colours)
+    for _ in range(colours - 1):
+        guess = rng.sample(range(colours), colours)
+        right = sum(a == b for a, b in zip(guess, secret))
+        knowledge.add(Or(*[
+            And(*[symbol(guess[i], i) if i in chosen
+                  else Not(symbol(guess[i], i)) for i in positions])
+            for chosen in itertools.combinations(positions, right)
+        ]))
+    symbols = [symbol(colour, i) for colour in range(colours)
+               for i in positions]
+    return knowledge, symbols
+
+
+def pigeonhole(holes):
+    """Returns the unsatisfiable problem of holes + 1 pigeons in holes."""
+    def symbol(pigeon, hole):
+        return Symbol(f"pigeon{pigeon}_{hole}")
+
+    knowledge = And()
+    for pigeon in range(holes + 1):
+        knowledge.add(Or(*[symbol(pigeon, hole) for hole in range(holes)]))
+    for hole in range(holes):
+        for a, b in itertools.combinations(range(holes + 1), 2):
+            knowledge.add(Not(And(symbol(a, hole), symbol(b, hole))))
+    return knowledge, [symbol(0, hole) for hole in range(holes)]
+
+
+def random_sat(variables, rng, ratio=4.26):
+    """Returns random 3-SAT at the satisfiability phase transition."""
+    symbols = [Symbol(f"x{i}") for i in range(variables)]
+    knowledge = And(*[
+        Or(*[symbol if rng.random() < 0.5 else Not(symbol)
+             for symbol in rng.sample(symbols, 3)])
+        for _ in range(round(ratio * variables))
+    ])
+    return knowledge, symbols[:5]
+
+
+def workloads(args):
+    """Yields every workload as (name, knowledge, queries)."""
+    yield from knights()
+    yield from lectures()
+    rng = random.Random(args.seed)
+    yield ("mastermind-generated",) + mastermind(args.colours, rng)
+    yield ("pigeonhole",) + pigeonhole(args.holes)
+    yield ("random-3sat",) + random_sat(args.variables, rng)
+
+
+def run(engine, knowledge, queries):
+    """Returns the answers and timing of an engine on every query.
+
+    Prepared engines are built once, and the time taken is reported as
+    build_seconds, apart from the time to answer the queries.
+    """
+    def answer():
+        """Returns the answers and the seconds spent building."""
+        if engine not in PREPARED:
+            return [model_check(knowledge, query, engine)
+                    for query in queries], 0
+        start = time.perf_counter()
+        prepared = PREPARED[engine](knowledge)
+        built = time.perf_counter() - start
+        return [prepared.entails(query) for query in queries], built
+
+    start = time.perf_counter()
+    answers, build_seconds = answer()
+    seconds = time.perf_counter() - start - build_seconds
+
+    # Count work and memory, building included, in a second,
+    # instrumented pass
+    stats = enable_stats()
+    tracemalloc.start()
+    try:
+        answer()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        disable_stats()
+
+    return {
+        "answers": answers,
+        "build_seconds": build_seconds,
+        "seconds": seconds,
+        "per_query": seconds / len(queries),
+        "models": stats.models,
+        "models_per_second": stats.models / seconds if seconds else None,
+        "decisions": stats.decisions,
+        "conflicts": stats.conflicts,
+        "peak_memory": peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--engines", nargs="+",
+                        default=list(logic.ENGINES) + list(PREPARED))
+    parser.add_argument("--workloads", nargs="+",
+                        help="only run workloads with these names")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--dimacs", help="directory to save workloads to")
+    parser.add_argument("--colours", type=int, default=5)
+    parser.add_argument("--holes", type=int, default=4)
+    parser.add_argument("--variables", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = []
+    for name, knowledge, queries in workloads(args):
+        if args.workloads and name not in args.workloads:
+            continue
+        symbols = len(knowledge.symbols().union(
+            *[query.symbols() for query in queries]
+        ))
+        print(f"{name}: {symbols} symbols, {len(queries)} queries")
+        if args.dimacs:
+            os.makedirs(args.dimacs, exist_ok=True)
+            with open(os.path.join(args.dimacs, f"{name}.cnf"), "w") as f:
+                f.write(logic.CNF.encode(knowledge).to_dimacs())
+
+        answers = None
+        for engine in args.engines:
+            if symbols > SYMBOL_LIMITS.get(engine, symbols):
+                continue
+            result = run(engine, knowledge, queries)
+            result.update(workload=name, engine=engine, symbols=symbols,
+                          queries=len(queries))
+
+            # Every engine must agree with the first one run
+            if answers is None:
+                answers = result["answers"]
+            result["agrees"] = result["answers"] == answers
+            results.append(result)
+            print(f"    {engine:>16} {result['per_query'] * 1000:10.3f} "
+                  f"ms/query {result['build_seconds'] * 1000:10.3f} "
+                  f"ms build {result['peak_memory'] / 1024:10.1f} KiB"
+                  + ("" if result["agrees"] else "  DISAGREES"))
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
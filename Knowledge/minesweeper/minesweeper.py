@@ -1,28 +1,27 @@
 import itertools
+import math
 import random
 import copy
 
-def Resolve(Knowledge):
-    temp_KB = []
-    for sentence1 in Knowledge:
-        for sentence2 in Knowledge:
-            # Ignore the the same sentence
-            if sentence1 == sentence2:
-                continue
-            # Check if sentence 2 is a subset of sentence 1
-            if sentence2.cells.issubset(sentence1.cells):
-                # If the cell is a subset then we create a new sentence
-                temp_cells = sentence1.cells - sentence2.cells
-                temp_count = sentence1.count - sentence2.count
-                temp_sentence = Sentence(temp_cells,temp_count)
-                temp_KB.append(temp_sentence)
-            # Check if sentence 1 is a subset of sentence 2
-            elif sentence1.cells.issubset(sentence2.cells):
-                temp_cells = sentence2.cells - sentence1.cells
-                temp_count = sentence2.count - sentence1.count
-                temp_sentence = Sentence(temp_cells,temp_count)
-                temp_KB.append(temp_sentence)
-    return(temp_KB)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def swap_remove(items, positions, item):
+    """
+    Removes item from the list items in O(1) by moving the last item into
+    its place, where positions maps every item to its index in items.
+    """
+    i = positions.pop(item, None)
+    if i is None:
+        return
+    last = items.pop()
+    if last != item:
+        items[i] = last
+        positions[last] = i
+
 
 class Minesweeper():
     """
@@ -99,6 +98,31 @@ class Minesweeper():
 
         return count
 
+    def reveal(self, cell, revealed=()):
+        """
+        Reveals a safe cell, and if no mines are nearby, every cell
+        around it in turn, returning a dict from each newly revealed
+        cell to its number of nearby mines.
+
+        Cells in revealed are taken as already shown and not revisited.
+        """
+        counts = dict()
+        frontier = [cell]
+        while frontier:
+            cell = frontier.pop()
+            if cell in counts or cell in revealed:
+                continue
+            counts[cell] = self.nearby_mines(cell)
+            if counts[cell] != 0:
+                continue
+
+            # None of the neighbours is a mine, so reveal them all
+            for i in range(cell[0] - 1, cell[0] + 2):
+                for j in range(cell[1] - 1, cell[1] + 2):
+                    if 0 <= i < self.height and 0 <= j < self.width:
+                        frontier.append((i, j))
+        return counts
+
     def won(self):
         """
         Checks if all mines have been flagged.
@@ -106,6 +130,52 @@ class Minesweeper():
         return self.mines_found == self.mines
 
 
+class NumpyMinesweeper(Minesweeper):
+    """
+    Minesweeper game keeping its mines in a NumPy array, with the number
+    of nearby mines counted for every cell when the board is made.
+    """
+
+    def __init__(self, height=8, width=8, mines=8):
+        if np is None:
+            raise ImportError("NumpyMinesweeper requires numpy")
+
+        # Set initial width, height, and number of mines
+        self.height = height
+        self.width = width
+
+        # Pick the mines' cells at once, without replacement, seeding
+        # NumPy from random so that random.seed still repeats a board
+        generator = np.random.default_rng(random.getrandbits(64))
+        board = np.zeros(height * width, dtype=bool)
+        board[generator.choice(height * width, mines, replace=False)] = True
+        self.board = board.reshape(height, width)
+        rows, columns = np.nonzero(self.board)
+        self.mines = set(zip(rows.tolist(), columns.tolist()))
+
+        # Count nearby mines by adding up shifted views of a padded board
+        padded = np.pad(self.board, 1).astype(np.uint8)
+        self.counts = np.zeros((height, width), dtype=np.uint8)
+        for i in range(3):
+            for j in range(3):
+                if (i, j) != (1, 1):
+                    self.counts += padded[i:i + height, j:j + width]
+
+        # At first, player has found no mines
+        self.mines_found = set()
+
+    def is_mine(self, cell):
+        return bool(self.board[cell])
+
+    def nearby_mines(self, cell):
+        """
+        Returns the number of mines that are
+        within one row and column of a given cell,
+        not including the cell itself.
+        """
+        return int(self.counts[cell])
+
+
 class Sentence():
     """
     Logical statement about a Minesweeper game
@@ -123,6 +193,24 @@ class Sentence():
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    def key(self):
+        """
+        Returns a hashable key that is equal for equal sentences.
+        """
+        return (frozenset(self.cells), self.count)
+
+    def issubset(self, other):
+        """
+        Returns True if every cell of self is also in other.
+        """
+        return self.cells <= other.cells
+
+    def difference(self, other):
+        """
+        Returns the sentence left after removing a subset other from self.
+        """
+        return Sentence(self.cells - other.cells, self.count - other.count)
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
@@ -181,12 +269,19 @@ class MinesweeperAI():
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None, gaussian=False):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Number of mines on the board, if known
+        self.total_mines = mines
+
+        # Whether to also infer by Gaussian elimination, once subsets
+        # have given all they can
+        self.gaussian = gaussian
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -194,8 +289,31 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Sentences about the game known to be true, keyed by their key
+        self.knowledge = dict()
+
+        # Map each undecided cell to the keys of sentences that mention it
+        self.index = dict()
+
+        # Keys of sentences that changed since they were last examined
+        self.pending = []
+
+        # Cells of sentences added since the last elimination
+        self.touched = set()
+
+        # Cells that may still be played, with each cell's place in the list
+        self.candidates = [(i, j) for i in range(height) for j in range(width)]
+        self.positions = {cell: i for i, cell in enumerate(self.candidates)}
+
+        # Cells known to be safe but not yet played, kept the same way
+        self.safe_moves = []
+        self.safe_positions = dict()
+
+    def remove_candidate(self, cell):
+        """
+        Removes a cell from the cells that may still be played.
+        """
+        swap_remove(self.candidates, self.positions, cell)
 
     def mark_mine(self, cell):
         """
@@ -203,17 +321,151 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        self.remove_candidate(cell)
+        for key in list(self.index.get(cell, ())):
+            sentence = self.remove_sentence(key)
             sentence.mark_mine(cell)
+            self.add_sentence(sentence)
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
+        if cell not in self.moves_made and cell not in self.safe_positions:
+            self.safe_positions[cell] = len(self.safe_moves)
+            self.safe_moves.append(cell)
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        for key in list(self.index.get(cell, ())):
+            sentence = self.remove_sentence(key)
             sentence.mark_safe(cell)
+            self.add_sentence(sentence)
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base unless it is empty
+        or already known, and queues it to be examined.
+        """
+        cells = sentence.cells
+        if not cells:
+            return
+        key = sentence.key()
+        if key in self.knowledge:
+            return
+        self.knowledge[key] = sentence
+        if self.gaussian:
+            self.touched.update(cells)
+        for cell in cells:
+            self.index.setdefault(cell, set()).add(key)
+        self.pending.append(key)
+
+    def remove_sentence(self, key):
+        """
+        Removes a sentence from the knowledge base and returns it.
+        """
+        sentence = self.knowledge.pop(key)
+        for cell in sentence.cells:
+            keys = self.index[cell]
+            keys.discard(key)
+            if not keys:
+                del self.index[cell]
+        return sentence
+
+    def infer(self):
+        """
+        Examines pending sentences until nothing more can be concluded,
+        marking known cells and adding sentences inferred from subsets.
+        """
+        while self.pending:
+            # Skip sentences that were changed or dropped since queued
+            sentence = self.knowledge.get(self.pending.pop())
+            if sentence is None:
+                continue
+
+            # Marking cells queues every sentence that mentions them
+            if sentence.known_mines():
+                for cell in sentence.known_mines():
+                    self.mark_mine(cell)
+                continue
+            if sentence.known_safes():
+                for cell in sentence.known_safes():
+                    self.mark_safe(cell)
+                continue
+
+            # Only sentences sharing a cell can be subsets of each other
+            neighbours = set()
+            for cell in sentence.cells:
+                neighbours.update(self.index[cell])
+            for key in neighbours:
+                other = self.knowledge[key]
+                # Equal cell sets leave an empty sentence, which is ignored
+                if sentence.issubset(other):
+                    self.add_sentence(other.difference(sentence))
+                elif other.issubset(sentence):
+                    self.add_sentence(sentence.difference(other))
+
+    def eliminate(self):
+        """
+        Reduces the sentences about recently touched cells by integer
+        Gaussian elimination, marks every cell the reduced sentences
+        force to be a mine or safe, and returns whether any was marked.
+        """
+        mines = set()
+        safes = set()
+        touched, self.touched = self.touched, set()
+        for cells, sentences in self.components(touched):
+
+            # Each row maps cells to coefficients and sums to its count
+            rows = [[dict.fromkeys(sentence.cells, 1), sentence.count]
+                    for sentence in sentences]
+            columns = dict()
+            for r, (row, count) in enumerate(rows):
+                for cell in row:
+                    columns.setdefault(cell, set()).add(r)
+
+            for r, (row, count) in enumerate(rows):
+                if not row:
+                    continue
+                # Pivot on the cell in fewest rows to limit fill-in
+                pivot = min(row, key=lambda cell: len(columns[cell]))
+                for o in columns[pivot] - {r}:
+                    other, total = rows[o]
+                    a, b = row[pivot], other[pivot]
+                    combined = dict()
+                    for cell in row.keys() | other.keys():
+                        value = a * other.get(cell, 0) - b * row.get(cell, 0)
+                        if value:
+                            combined[cell] = value
+                        elif cell in other:
+                            columns[cell].discard(o)
+                    for cell in combined:
+                        columns[cell].add(o)
+                    total = a * total - b * count
+
+                    # Keep coefficients small by dividing out common factors
+                    divisor = math.gcd(total, *combined.values())
+                    if divisor > 1:
+                        combined = {cell: value // divisor
+                                    for cell, value in combined.items()}
+                        total //= divisor
+                    rows[o] = [combined, total]
+
+            # A row at one of its bounds decides every cell in it
+            for row, count in rows:
+                low = sum(value for value in row.values() if value < 0)
+                high = sum(value for value in row.values() if value > 0)
+                if count == low or count == high:
+                    for cell, value in row.items():
+                        if (value > 0) == (count == high):
+                            mines.add(cell)
+                        else:
+                            safes.add(cell)
+
+        for cell in mines:
+            self.mark_mine(cell)
+        for cell in safes:
+            self.mark_safe(cell)
+        return bool(mines or safes)
 
     def add_knowledge(self, cell, count):
         """
@@ -230,70 +482,197 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
-        # Add cell to moves set
-        self.moves_made.add(cell)
-        # Add cell to safe set
-        self.safes.add(cell)
+        self.add_knowledge_many([(cell, count)])
+
+    def add_knowledge_many(self, cells_counts):
+        """
+        Adds knowledge for several revealed cells at once, given as
+        (cell, count) pairs or a dict, and infers from all of it
+        in a single pass.
+        """
+        if isinstance(cells_counts, dict):
+            cells_counts = cells_counts.items()
+        cells_counts = [(cell, count) for cell, count in cells_counts
+                        if cell not in self.moves_made]
+
+        # Mark every cell first, so no sentence includes a revealed cell
+        for cell, count in cells_counts:
+            self.moves_made.add(cell)
+            self.remove_candidate(cell)
+            swap_remove(self.safe_moves, self.safe_positions, cell)
+            self.mark_safe(cell)
+
+        for cell, count in cells_counts:
+            cells = set()
+            # Loop over all cells within one row and column
+            for i in range(cell[0] - 1, cell[0] + 2):
+                for j in range(cell[1] - 1, cell[1] + 2):
+                    # Ignore the cell itself
+                    if (i, j) == cell:
+                        continue
+                    # Make sure cell is within the bounds of the board
+                    if 0 <= i < self.height and 0 <= j < self.width:
+                        # Leave out cells that are already decided
+                        if (i, j) in self.mines:
+                            count -= 1
+                        elif (i, j) not in self.safes:
+                            cells.add((i, j))
+            self.add_sentence(Sentence(cells, count))
+
+        # Infer everything that follows from the new sentences
+        self.infer()
+        while self.gaussian and self.eliminate():
+            self.infer()
+
+    def components(self, cells=None):
+        """
+        Splits the undecided cells mentioned in the knowledge base into
+        groups that share no sentence, returning each group's cells in
+        breadth-first order together with its sentences.
+
+        If cells is given, only returns the groups containing them.
+        """
+        groups = []
+        seen = set()
+        for start in self.index if cells is None else cells:
+            if start in seen or start not in self.index:
+                continue
+            seen.add(start)
+            cells = [start]
+            keys = set()
+            # The list grows as neighbours are found
+            for cell in cells:
+                for key in self.index[cell]:
+                    if key in keys:
+                        continue
+                    keys.add(key)
+                    for other in self.knowledge[key].cells:
+                        if other not in seen:
+                            seen.add(other)
+                            cells.append(other)
+            groups.append((cells, [self.knowledge[key] for key in keys]))
+        return groups
+
+    def count_solutions(self, cells, sentences):
+        """
+        Counts the mine placements in cells that satisfy sentences.
+
+        Returns a dict mapping each number of mines to a list holding
+        the number of placements and, for every cell, the number of
+        those placements in which it is a mine.
+        """
+        position = {cell: i for i, cell in enumerate(cells)}
+        remaining = [sentence.count for sentence in sentences]
+
+        # For each cell, its sentences and how many of their cells follow
+        constraints = [[] for cell in cells]
+        # For each cell, the sentences partly assigned before it
+        started = [[] for cell in cells]
+        for c, sentence in enumerate(sentences):
+            positions = sorted(position[cell] for cell in sentence.cells)
+            for k, p in enumerate(positions):
+                constraints[p].append((c, len(positions) - k - 1))
+            for p in range(positions[0] + 1, positions[-1] + 1):
+                started[p].append(c)
+
+        # Placements from a cell onward depend only on the open sentences
+        memo = dict()
+
+        def solve(p):
+            if p == len(cells):
+                return {0: [1]}
+            key = (p, tuple(remaining[c] for c in started[p]))
+            if key in memo:
+                return memo[key]
+            result = dict()
+            for value in (0, 1):
+                for c, after in constraints[p]:
+                    remaining[c] -= value
+                if all(0 <= remaining[c] <= after
+                       for c, after in constraints[p]):
+                    for mines, counts in solve(p + 1).items():
+                        total = result.setdefault(
+                            mines + value, [0] * (len(cells) - p + 1)
+                        )
+                        total[0] += counts[0]
+                        total[1] += counts[0] * value
+                        for i in range(1, len(counts)):
+                            total[i + 1] += counts[i]
+                for c, after in constraints[p]:
+                    remaining[c] += value
+            memo[key] = result
+            return result
+
+        return solve(0)
+
+    def mine_probabilities(self):
+        """
+        Returns the exact probability of being a mine for every cell
+        not yet played or known, or None if the number of mines is
+        unknown or the knowledge base admits no placement.
+
+        Each group of cells is counted separately, and the groups are
+        combined by weighting every total number of mines among them
+        by the ways to place the rest on unconstrained cells.
+        """
+        if self.total_mines is None:
+            return None
+        unknown = [cell for cell in self.candidates if cell not in self.safes]
+        groups = self.components()
+        solutions = [self.count_solutions(cells, sentences)
+                     for cells, sentences in groups]
+        left = self.total_mines - len(self.mines)
+        others = len(unknown) - sum(len(cells) for cells, _ in groups)
+
+        def combine(a, b):
+            result = dict()
+            for i, x in a.items():
+                for j, y in b.items():
+                    result[i + j] = result.get(i + j, 0) + x * y
+            return result
+
+        # Ways to place each number of mines in the groups before and after
+        ways = [{mines: counts[0] for mines, counts in solution.items()}
+                for solution in solutions]
+        before = [{0: 1}]
+        for w in ways:
+            before.append(combine(before[-1], w))
+        after = [{0: 1}]
+        for w in reversed(ways):
+            after.append(combine(after[-1], w))
+        after.reverse()
+
+        def weight(mines):
+            if not 0 <= left - mines <= others:
+                return 0
+            return math.comb(others, left - mines)
+
+        total = sum(count * weight(mines)
+                    for mines, count in before[-1].items())
+        if total == 0:
+            return None
+
+        probabilities = dict()
+        for g, (cells, _) in enumerate(groups):
+            rest = combine(before[g], after[g + 1])
+            mines = [0] * len(cells)
+            for k, counts in solutions[g].items():
+                factor = sum(count * weight(k + m)
+                             for m, count in rest.items())
+                for i in range(len(cells)):
+                    mines[i] += counts[i + 1] * factor
+            for cell, count in zip(cells, mines):
+                probabilities[cell] = count / total
+
+        # Unconstrained cells share the mines left over equally
+        if others:
+            expected = sum(count * weight(mines) * (left - mines)
+                           for mines, count in before[-1].items())
+            for cell in unknown:
+                if cell not in probabilities:
+                    probabilities[cell] = expected / total / others
+        return probabilities
 
-        cells = set()
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-                # Make sure cell is within the bounds of the board
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    # Add cell to logical sentence
-                    if ((i,j)) not in self.moves_made:
-                        cells.add((i,j))
-        # Create a sentence with the cells and their count
-        new_knowledge = Sentence(cells,count)
-        self.knowledge.append(new_knowledge)
-        # Infer new sentences from our KB
-        inferred_knowledge = Resolve(self.knowledge)
-
-        # Add the known safe cells to safe set
-        for sentence in inferred_knowledge:
-            if sentence.known_safes():
-                for cell in sentence.known_safes():
-                    self.safes.add(cell)
-        # Mark the safe cells from our set in our sentences  
-        for sentence in inferred_knowledge:
-            for cell in self.safes:
-                sentence.mark_safe(cell)
-        
-        # Add the known mines cells to mine set
-        for sentence in inferred_knowledge:
-            if sentence.known_mines():
-                for cell in sentence.known_mines():
-                    self.mines.add(cell)
-        # Mark the mine cells from our set in our sentences  
-        for sentence in inferred_knowledge:
-            for cell in self.mines:
-                sentence.mark_mine(cell)
-
-        # Add the known safe cells to safe set
-        for sentence in self.knowledge:
-            if sentence.known_safes():
-                for cell in sentence.known_safes():
-                    self.safes.add(cell)
-        # Mark the safe cells from our set in our sentences  
-        for sentence in self.knowledge:
-                for cell in self.safes:
-                    sentence.mark_safe(cell)
-        
-        # Add the known mines cells to mine set
-        for sentence in self.knowledge:
-            if sentence.known_mines():
-                for cell in sentence.known_mines():
-                    self.mines.add(cell)
-        # Mark the mine cells from our set in our sentences  
-        for sentence in self.knowledge:
-            for cell in self.mines:
-                sentence.mark_mine(cell)
-            
-            
     def make_safe_move(self):
         """
         Returns a safe cell to choose on the Minesweeper board.
@@ -303,11 +682,9 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        # Look for known safe cells
-        for cell in self.safes:
-            # Check if cell has not been played
-            if cell not in self.moves_made:
-                return(cell)
+        # Any known safe cell that has not been played
+        if self.safe_moves:
+            return(self.safe_moves[-1])
         return(None)
 
     def make_random_move(self):
@@ -316,25 +693,25 @@ class MinesweeperAI():
         Should choose randomly among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+
+        When the number of mines is known, chooses randomly among
+        the cells least likely to be mines instead.
         """
-        # Generate a random cell within bounds of board
-        i = random.randint(0,self.height-1)
-        j = random.randint(0,self.width-1)
-        cell = (i,j)
-        flag = True
-        # If 56 moves have been made then have played all the safe cells
-        if len(self.moves_made) == 56:
+        # Once the cells left are all mines, every safe cell has been played
+        if self.total_mines is not None:
+            if len(self.candidates) + len(self.mines) == self.total_mines:
+                return(None)
+
+        # Take the smallest risk when it can be worked out
+        probabilities = self.mine_probabilities()
+        if probabilities:
+            lowest = min(probabilities.values())
+            return random.choice([cell for cell, p in probabilities.items()
+                                  if p == lowest])
+
+        # Every cell has been played or is known to be a mine
+        if not self.candidates:
             return(None)
-         # Check if created cell has been played or is a known mine
-        while flag:
-            if cell not in self.moves_made:
-                if cell not in self.mines:
-                    flag = False
-            # Continue creating cell
-            if flag:
-                i = random.randint(0,self.height-1)
-                j = random.randint(0,self.width-1)
-                cell = (i,j)
-        return (cell)
+        return random.choice(self.candidates)
 
 
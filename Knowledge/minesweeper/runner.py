@@ -39,7 +39,7 @@ mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
 # Create game and AI agent
 game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
 
 # Keep track of revealed cells, flagged cells, and if a mine was hit
 revealed = set()
@@ -196,7 +196,7 @@ while True:
         # Reset game state
         elif resetButton.collidepoint(mouse):
             game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+            ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
             revealed = set()
             flags = set()
             lost = False
@@ -216,8 +216,10 @@ while True:
             if game.is_mine(move):
                 lost = True
             else:
-                nearby = game.nearby_mines(move)
-                revealed.add(move)
-                ai.add_knowledge(move, nearby)
+                # Reveal the whole region around cells with no nearby mines
+                counts = game.reveal(move, revealed)
+                revealed.update(counts)
+                flags.difference_update(counts)
+                ai.add_knowledge_many(counts)
 
     pygame.display.flip()
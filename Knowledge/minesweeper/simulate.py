@@ -0,0 +1,124 @@
+"""
+Plays Minesweeper games between the game and MinesweeperAI without a
+display, spread across processes, and reports how well and how fast
+the AI plays.
+
+Usage: python simulate.py [--games 1000] [--height 16 --width 30 --mines 99]
+"""
+
+import argparse
+import functools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from minesweeper import Minesweeper, MinesweeperAI, NumpyMinesweeper
+
+
+def play(options, seed):
+    """
+    Plays one game seeded by seed, returning whether it was won,
+    the number of moves made and the seconds each move took.
+    """
+    random.seed(seed)
+    board = NumpyMinesweeper if options["numpy"] else Minesweeper
+    game = board(height=options["height"], width=options["width"],
+                 mines=options["mines"])
+    ai = MinesweeperAI(
+        height=options["height"], width=options["width"],
+        gaussian=options["gaussian"],
+        mines=options["mines"] if options["probabilities"] else None
+    )
+
+    safe = options["height"] * options["width"] - options["mines"]
+    latencies = []
+    while len(ai.moves_made) < safe:
+
+        # Time the AI choosing a move and learning from it
+        start = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+        if move is None or game.is_mine(move):
+            break
+        ai.add_knowledge_many(game.reveal(move, ai.moves_made))
+        latencies.append(time.perf_counter() - start)
+
+    return len(ai.moves_made) == safe, len(latencies), latencies
+
+
+def percentile(values, fraction):
+    """
+    Returns the value below which fraction of sorted values fall.
+    """
+    if not values:
+        return 0
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--numpy", action="store_true",
+                        help="use the NumPy-backed board")
+    parser.add_argument("--gaussian", action="store_true",
+                        help="also infer by Gaussian elimination")
+    parser.add_argument("--probabilities", action="store_true",
+                        help="tell the AI the number of mines so it "
+                             "guesses by mine probability")
+    parser.add_argument("--output", help="file to write results to as JSON")
+    args = parser.parse_args()
+
+    # Each game has its own seed, so results do not depend on the workers
+    seeds = range(args.seed, args.seed + args.games)
+    game = functools.partial(play, vars(args))
+    wins = 0
+    moves = 0
+    latencies = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        chunksize = max(1, args.games // (4 * args.workers))
+        for won, made, times in executor.map(game, seeds,
+                                             chunksize=chunksize):
+            wins += won
+            moves += made
+            latencies.extend(times)
+    seconds = time.perf_counter() - start
+    latencies.sort()
+
+    results = {
+        "games": args.games,
+        "wins": wins,
+        "win_rate": wins / args.games,
+        "moves": moves,
+        "seconds": seconds,
+        "moves_per_second": moves / seconds,
+        "latency": {
+            "p50": percentile(latencies, 0.5),
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else 0,
+        },
+    }
+    print(f"Won {wins} of {args.games} games ({100 * wins / args.games:.1f}%)")
+    print(f"{moves} moves in {seconds:.2f}s "
+          f"({results['moves_per_second']:.0f} moves/s)")
+    print("Move latency: " + ", ".join(
+        f"{name} {value * 1000:.3f}ms"
+        for name, value in results["latency"].items()
+    ))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
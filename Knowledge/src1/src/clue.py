@@ -1,7 +1,12 @@
+import sys
+
 import termcolor
 
 from logic import *
 
+# Pass --stats to report the work done by model_check
+stats = enable_stats() if "--stats" in sys.argv else None
+
 mustard = Symbol("ColMustard")
 plum = Symbol("ProfPlum")
 scarlet = Symbol("MsScarlet")
@@ -21,10 +26,11 @@ symbols = characters + rooms + weapons
 
 
 def check_knowledge(knowledge):
+    entailed = entailed_literals(knowledge, symbols)
     for symbol in symbols:
-        if model_check(knowledge, symbol):
+        if entailed[symbol]:
             termcolor.cprint(f"{symbol}: YES", "green")
-        elif not model_check(knowledge, Not(symbol)):
+        elif entailed[symbol] is None:
             print(f"{symbol}: MAYBE")
 
 
@@ -50,3 +56,6 @@ knowledge.add(Not(plum))
 knowledge.add(Not(ballroom))
 
 check_knowledge(knowledge)
+
+if stats is not None:
+    print(stats)
@@ -1,19 +1,140 @@
+import heapq
 import itertools
+import multiprocessing
+import os
+import struct
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# A uint64 word of models, all true
+ALL_MODELS = (1 << 64) - 1
+
+# Truth tables are swept 2^CHUNK_BITS words (64 models each) at a time
+CHUNK_BITS = 14
+
+# Fewer symbols than this are not worth starting worker processes for
+PARALLEL_SYMBOLS = 16
+
+# Workers look for a stop signal after sweeping this many models
+PARALLEL_BLOCK = 4096
+
+# Set in worker processes once any of them has found a counter-model
+stop_signal = None
+
+# Counters updated by model_check, once enabled with enable_stats
+stats = None
 
 
 class Sentence():
+    __slots__ = ("_compiled", "__weakref__")
+
+    # Bumped whenever a tree changes, invalidating compiled evaluators
+    generation = 0
+
+    # Every Symbol, Not, Or, Implication and Biconditional in use, keyed by
+    # its class and operands, so equal sentences share a single node
+    interned = weakref.WeakValueDictionary()
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_mask(self, mask, index):
+        """Evaluates the sentence in a model packed into an int.
+
+        Symbol i is true in the model when bit index[name] is set in mask.
+        """
+        raise Exception("nothing to evaluate")
+
+    def compile(self, symbols):
+        """Returns a function evaluating the sentence in a packed model.
+
+        symbols lists the symbol names in bit order, as for evaluate_mask.
+        The function is generated once from the tree and cached on the
+        sentence until some And in the program is changed by And.add.
+        """
+        symbols = tuple(symbols)
+        cached = getattr(self, "_compiled", None)
+        if cached and cached[:2] == (Sentence.generation, symbols):
+            return cached[2]
+        index = {symbol: 1 << i for i, symbol in enumerate(symbols)}
+        try:
+            function = eval(f"lambda m: {self.source(index)}", {})
+        except (SyntaxError, RecursionError, MemoryError):
+            # Trees nested too deeply for the parser are walked instead
+            function = lambda mask: self.evaluate_mask(mask, index)
+        self._compiled = (Sentence.generation, symbols, function)
+        return function
+
+    def source(self, index):
+        """Returns a Python expression evaluating the sentence over mask m."""
+        raise Exception("nothing to evaluate")
+
+    def evaluate_columns(self, columns):
+        """Evaluates the sentence over many models at once with NumPy.
+
+        columns maps each symbol name to uint64 words holding one model per
+        bit, and the result is packed the same way.
+        """
+        raise Exception("nothing to evaluate")
+
+    def evaluate_partial(self, model):
+        """Evaluates the sentence in a model that may leave symbols out.
+
+        Returns True or False if the assigned symbols already decide the
+        sentence, and None if its value depends on the unassigned ones.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
-        """Returns a set of all symbols in the logical sentence."""
-        return set()
+        """Returns a frozen set of all symbols in the logical sentence."""
+        return frozenset()
+
+    @classmethod
+    def intern(cls, key):
+        """Returns the shared sentence for key, or a new one to fill in.
+
+        Operands are keyed by identity: they are interned themselves, or
+        else are And nodes, which are mutable and so never shared.
+        """
+        try:
+            return Sentence.interned[key], False
+        except KeyError:
+            sentence = object.__new__(cls)
+            Sentence.interned[key] = sentence
+            return sentence, True
+
+    def refresh(self):
+        """Recomputes the cached hash and symbols if they may be stale.
+
+        Nodes with an And somewhere below them are tagged with the
+        generation their cache was computed in, as And.add can change
+        their hash and symbols after they are built. Subclasses provide
+        summary(), returning both computed afresh.
+        """
+        if self._stamp is not None and self._stamp != Sentence.generation:
+            self._hash, self._symbols = self.summary()
+            self._stamp = Sentence.generation
+
+    @classmethod
+    def mutable(cls, *operands):
+        """Returns the generation if an And lies below operands, else None."""
+        for operand in operands:
+            if isinstance(operand, And) or (
+                getattr(operand, "_stamp", None) is not None
+            ):
+                return Sentence.generation
+        return None
 
     @classmethod
     def validate(cls, sentence):
@@ -43,15 +164,26 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name", "_hash", "_symbols")
+
+    def __new__(cls, name):
+        sentence, new = cls.intern((cls, name))
+        if new:
+            sentence.name = name
+            sentence._hash = hash(("symbol", name))
+            sentence._symbols = frozenset([name])
+        return sentence
 
-    def __init__(self, name):
-        self.name = name
+    def __reduce__(self):
+        return (Symbol, (self.name,))
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (
+            isinstance(other, Symbol) and self.name == other.name
+        )
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        return self._hash
 
     def __repr__(self):
         return self.name
@@ -62,23 +194,53 @@ class Symbol(Sentence):
         except KeyError:
             raise EvaluationException(f"variable {self.name} not in model")
 
+    def evaluate_mask(self, mask, index):
+        return bool(mask & index[self.name])
+
+    def source(self, index):
+        return f"(m & {index[self.name]})"
+
+    def evaluate_columns(self, columns):
+        return columns[self.name]
+
+    def evaluate_partial(self, model):
+        return model.get(self.name)
+
     def formula(self):
         return self.name
 
     def symbols(self):
-        return {self.name}
+        return self._symbols
 
 
 class Not(Sentence):
-    def __init__(self, operand):
+    __slots__ = ("operand", "_hash", "_symbols", "_stamp")
+
+    def __new__(cls, operand):
         Sentence.validate(operand)
-        self.operand = operand
+        sentence, new = cls.intern((cls, id(operand)))
+        if new:
+            sentence.operand = operand
+            sentence._stamp = Sentence.mutable(operand)
+            sentence._hash, sentence._symbols = sentence.summary()
+        return sentence
+
+    def summary(self):
+        return hash(("not", hash(self.operand))), self.operand.symbols()
+
+    def __reduce__(self):
+        return (Not, (self.operand,))
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (
+            isinstance(other, Not) and hash(self) == hash(other)
+            and self.operand == other.operand
+        )
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        if self._stamp is not None:
+            self.refresh()
+        return self._hash
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,26 +248,53 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_mask(self, mask, index):
+        return not self.operand.evaluate_mask(mask, index)
+
+    def source(self, index):
+        return f"(not {self.operand.source(index)})"
+
+    def evaluate_columns(self, columns):
+        return ~self.operand.evaluate_columns(columns)
+
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
     def symbols(self):
-        return self.operand.symbols()
+        if self._stamp is not None:
+            self.refresh()
+        return self._symbols
 
 
 class And(Sentence):
+    __slots__ = ("conjuncts", "_hash", "_symbols", "_stamp")
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
 
+        # Caches are only valid in the generation they were computed in,
+        # since any And below this one may have changed since
+        self._hash = None
+        self._symbols = None
+        self._stamp = None
+
+    def __reduce__(self):
+        return (And, tuple(self.conjuncts))
+
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (
+            isinstance(other, And) and self.conjuncts == other.conjuncts
+        )
 
     def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        self.refresh()
+        return self._hash
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -116,33 +305,97 @@ class And(Sentence):
     def add(self, conjunct):
         Sentence.validate(conjunct)
         self.conjuncts.append(conjunct)
+        Sentence.generation += 1
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_mask(self, mask, index):
+        for conjunct in self.conjuncts:
+            if not conjunct.evaluate_mask(mask, index):
+                return False
+        return True
+
+    def source(self, index):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(
+            conjunct.source(index) for conjunct in self.conjuncts
+        ) + ")"
+
+    def evaluate_columns(self, columns):
+        result = np.uint64(ALL_MODELS)
+        for conjunct in self.conjuncts:
+            result = result & conjunct.evaluate_columns(columns)
+        return result
+
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
+    def refresh(self):
+        if self._stamp != Sentence.generation:
+            self._hash, self._symbols = self.summary()
+            self._stamp = Sentence.generation
+
+    def summary(self):
+        return hash(
+            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
+        ), frozenset().union(
+            *[conjunct.symbols() for conjunct in self.conjuncts]
+        )
+
     def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+        self.refresh()
+        return self._symbols
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+    __slots__ = ("disjuncts", "_hash", "_symbols", "_stamp")
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+        key = (cls,) + tuple(id(disjunct) for disjunct in disjuncts)
+        sentence, new = cls.intern(key)
+        if new:
+            sentence.disjuncts = tuple(disjuncts)
+            sentence._stamp = Sentence.mutable(*disjuncts)
+            sentence._hash, sentence._symbols = sentence.summary()
+        return sentence
+
+    def summary(self):
+        return hash(
+            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
+        ), frozenset().union(
+            *[disjunct.symbols() for disjunct in self.disjuncts]
+        )
+
+    def __reduce__(self):
+        return (Or, self.disjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (
+            isinstance(other, Or) and hash(self) == hash(other)
+            and self.disjuncts == other.disjuncts
+        )
 
     def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        if self._stamp is not None:
+            self.refresh()
+        return self._hash
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -151,6 +404,35 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_mask(self, mask, index):
+        for disjunct in self.disjuncts:
+            if disjunct.evaluate_mask(mask, index):
+                return True
+        return False
+
+    def source(self, index):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(
+            disjunct.source(index) for disjunct in self.disjuncts
+        ) + ")"
+
+    def evaluate_columns(self, columns):
+        result = np.uint64(0)
+        for disjunct in self.disjuncts:
+            result = result | disjunct.evaluate_columns(columns)
+        return result
+
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value:
+                return True
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
@@ -158,23 +440,45 @@ class Or(Sentence):
                             for disjunct in self.disjuncts])
 
     def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+        if self._stamp is not None:
+            self.refresh()
+        return self._symbols
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    __slots__ = ("antecedent", "consequent", "_hash", "_symbols", "_stamp")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+        key = (cls, id(antecedent), id(consequent))
+        sentence, new = cls.intern(key)
+        if new:
+            sentence.antecedent = antecedent
+            sentence.consequent = consequent
+            sentence._stamp = Sentence.mutable(antecedent, consequent)
+            sentence._hash, sentence._symbols = sentence.summary()
+        return sentence
+
+    def summary(self):
+        return hash(
+            ("implies", hash(self.antecedent), hash(self.consequent))
+        ), self.antecedent.symbols() | self.consequent.symbols()
+
+    def __reduce__(self):
+        return (Implication, (self.antecedent, self.consequent))
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (
+            isinstance(other, Implication) and hash(self) == hash(other)
+            and self.antecedent == other.antecedent
+            and self.consequent == other.consequent
+        )
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        if self._stamp is not None:
+            self.refresh()
+        return self._hash
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,29 +487,74 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_mask(self, mask, index):
+        return ((not self.antecedent.evaluate_mask(mask, index))
+                or self.consequent.evaluate_mask(mask, index))
+
+    def source(self, index):
+        antecedent = self.antecedent.source(index)
+        consequent = self.consequent.source(index)
+        return f"(not {antecedent} or {consequent})"
+
+    def evaluate_columns(self, columns):
+        return (~self.antecedent.evaluate_columns(columns)
+                | self.consequent.evaluate_columns(columns))
+
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
     def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+        if self._stamp is not None:
+            self.refresh()
+        return self._symbols
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    __slots__ = ("left", "right", "_hash", "_symbols", "_stamp")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
+        sentence, new = cls.intern((cls, id(left), id(right)))
+        if new:
+            sentence.left = left
+            sentence.right = right
+            sentence._stamp = Sentence.mutable(left, right)
+            sentence._hash, sentence._symbols = sentence.summary()
+        return sentence
+
+    def summary(self):
+        return hash(
+            ("biconditional", hash(self.left), hash(self.right))
+        ), self.left.symbols() | self.right.symbols()
+
+    def __reduce__(self):
+        return (Biconditional, (self.left, self.right))
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (
+            isinstance(other, Biconditional) and hash(self) == hash(other)
+            and self.left == other.left
+            and self.right == other.right
+        )
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        if self._stamp is not None:
+            self.refresh()
+        return self._hash
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,17 +565,365 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    def evaluate_mask(self, mask, index):
+        return (self.left.evaluate_mask(mask, index)
+                == self.right.evaluate_mask(mask, index))
+
+    def source(self, index):
+        left = self.left.source(index)
+        right = self.right.source(index)
+        return f"((not {left}) == (not {right}))"
+
+    def evaluate_columns(self, columns):
+        return ~(self.left.evaluate_columns(columns)
+                 ^ self.right.evaluate_columns(columns))
+
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
+
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
     def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+        if self._stamp is not None:
+            self.refresh()
+        return self._symbols
+
+
+def simplify(sentence):
+    """Returns an equivalent sentence with a smaller tree.
+
+    Implications and biconditionals are rewritten with Not, And and Or,
+    negations are pushed down onto symbols, nested Ands and Ors are
+    flattened and their duplicate operands dropped (in any order), and
+    constants fold away, And() being true and Or() false.
+    """
+    rewritten = dict()
+
+    def rewrite(sentence, negated):
+        """Returns the simplified sentence, or its negation."""
+        key = (id(sentence), negated)
+        if key in rewritten:
+            return rewritten[key][1]
+
+        if isinstance(sentence, Symbol):
+            result = Not(sentence) if negated else sentence
+        elif isinstance(sentence, Not):
+            result = rewrite(sentence.operand, not negated)
+        elif isinstance(sentence, (And, Or)):
+            operands = (sentence.conjuncts if isinstance(sentence, And)
+                        else sentence.disjuncts)
+            # Negation swaps And and Or
+            connective = And if isinstance(sentence, And) != negated else Or
+            result = join(connective, [rewrite(operand, negated)
+                                       for operand in operands])
+        elif isinstance(sentence, Implication):
+            # a => b is ¬a ∨ b, and its negation is a ∧ ¬b
+            antecedent = rewrite(sentence.antecedent, not negated)
+            consequent = rewrite(sentence.consequent, negated)
+            result = join(And if negated else Or, [antecedent, consequent])
+        elif isinstance(sentence, Biconditional):
+            # a <=> b is (¬a ∨ b) ∧ (a ∨ ¬b), negated (a ∨ b) ∧ (¬a ∨ ¬b)
+            left = rewrite(sentence.left, False)
+            right = rewrite(sentence.right, negated)
+            not_left = rewrite(sentence.left, True)
+            not_right = rewrite(sentence.right, not negated)
+            result = join(And, [join(Or, [not_left, right]),
+                                join(Or, [left, not_right])])
+        else:
+            raise TypeError("must be a logical sentence")
 
+        # Keep the sentence alive so that its id is not reused
+        rewritten[key] = (sentence, result)
+        return result
+
+    def join(connective, operands):
+        """Returns a flat And or Or of operands, folding constants."""
+        absorbing = Or if connective is And else And
+        joined = []
+        seen = set()
+        for operand in operands:
+            if isinstance(operand, connective):
+                children = (operand.conjuncts if connective is And
+                            else operand.disjuncts)
+            else:
+                children = [operand]
+            for child in children:
+                if canonical(child) in seen:
+                    continue
+
+                # x ∧ ¬x is false and x ∨ ¬x is true, like And(Or()) is
+                if isinstance(child, Not):
+                    complement = child.operand
+                else:
+                    complement = Not(child)
+                if complement in seen or child == absorbing():
+                    return absorbing()
+                seen.add(canonical(child))
+                joined.append(child)
+        if len(joined) == 1:
+            return joined[0]
+        return connective(*joined)
+
+    def canonical(sentence):
+        """Returns a key equal for Ands or Ors of the same operands."""
+        if isinstance(sentence, And):
+            return (And, frozenset(sentence.conjuncts))
+        if isinstance(sentence, Or):
+            return (Or, frozenset(sentence.disjuncts))
+        return sentence
+
+    return rewrite(sentence, False)
+
+
+def model_check(knowledge, query, engine=None):
+    """Checks if knowledge base entails query.
+
+    The entailment engine defaults to the one selected with `use_engine`,
+    unless `engine` names one of the engines in ENGINES.
+    """
+    if engine is None:
+        if isinstance(knowledge, (KnowledgeBase, CompiledKnowledge)):
+            check = type(knowledge).entails
+        else:
+            engine = "cdcl" if isinstance(knowledge, CNF) else default_engine
+    if engine is not None:
+        try:
+            check = ENGINES[engine]
+        except KeyError:
+            raise ValueError(f"unknown entailment engine {engine!r}")
+        check_clauses(knowledge, engine)
+    if stats is not None:
+        return stats.measure(check, knowledge, query)
+    return check(knowledge, query)
+
+
+def use_engine(engine):
+    """Selects the entailment engine used by default in model_check."""
+    global default_engine
+    if engine not in ENGINES:
+        raise ValueError(f"unknown entailment engine {engine!r}")
+    default_engine = engine
+
+
+def entailed_literals(knowledge, symbols, engine=None):
+    """Returns what the knowledge base entails about each symbol.
+
+    Maps every symbol to True if knowledge entails it, False if knowledge
+    entails its negation, and None if it entails neither, walking the
+    models of knowledge once for all the symbols. As with model_check, an
+    unsatisfiable knowledge base entails every symbol.
+
+    Each engine in ENGINES has its own way of finding the literals, in
+    LITERAL_ENGINES, except that the engines enumerating models all share
+    one compiled sweep of them.
+    """
+    if engine is None:
+        if isinstance(knowledge, (KnowledgeBase, CompiledKnowledge)):
+            find = type(knowledge).entailed_literals
+        else:
+            engine = "cdcl" if isinstance(knowledge, CNF) else default_engine
+    if engine is not None:
+        try:
+            find = LITERAL_ENGINES[engine]
+        except KeyError:
+            raise ValueError(f"unknown entailment engine {engine!r}")
+        check_clauses(knowledge, engine)
+    if stats is not None:
+        return stats.measure(find, knowledge, symbols)
+    return find(knowledge, symbols)
+
+
+def check_clauses(knowledge, engine):
+    """Raises ValueError if knowledge is clauses the engine cannot read."""
+    if isinstance(knowledge, CNF) and engine not in CLAUSE_ENGINES:
+        raise ValueError(
+            f"engine {engine!r} needs sentences, not CNF clauses; "
+            f"use one of {', '.join(CLAUSE_ENGINES)}"
+        )
+
+
+def backbone_literals(knowledge, symbols):
+    """Finds the entailed literals among symbols with a SAT solver."""
+    cnf = CNF.encode(knowledge)
+    literals = {symbol: cnf.literal(symbol) for symbol in symbols}
+    return Solver(cnf.clauses).backbone(literals)
+
+
+def bdd_literals(knowledge, symbols):
+    """Finds the entailed literals among symbols by compiling to a BDD."""
+    return CompiledKnowledge(knowledge).entailed_literals(symbols)
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+
+def resolve_literals(knowledge, symbols):
+    """Finds the entailed literals among symbols by resolution."""
+    literals = dict()
+    for symbol in symbols:
+        if resolve_entails(knowledge, symbol):
+            literals[symbol] = True
+        elif resolve_entails(knowledge, Not(symbol)):
+            literals[symbol] = False
+        else:
+            literals[symbol] = None
+    return literals
+
+
+def sweep_literals(knowledge, symbols):
+    """Finds the entailed literals among symbols in one pass over models."""
+    names = sorted(knowledge.symbols().union(
+        *[symbol.symbols() for symbol in symbols]
+    ))
+    index = {name: 1 << i for i, name in enumerate(names)}
+    knowledge_true = knowledge.compile(names)
+
+    # Keep the bits that are true, or false, in every model seen so far
+    always = never = sum(set(index[symbol.name] for symbol in symbols))
+    for mask in range(1 << len(names)):
+        if knowledge_true(mask):
+            always &= mask
+            never &= ~mask
+            if not always and not never:
+                break
+
+    entailed = dict()
+    for symbol in symbols:
+        if always & index[symbol.name]:
+            entailed[symbol] = True
+        elif never & index[symbol.name]:
+            entailed[symbol] = False
+        else:
+            entailed[symbol] = None
+    return entailed
+
+
+def count_models(knowledge):
+    """Returns the number of models of the knowledge base's symbols.
+
+    Counts the models of the clauses encoding knowledge, whose auxiliary
+    variables are fixed by its symbols. After unit propagation, clauses
+    sharing no variables are counted separately as components, each of
+    which branches on its most frequent variable and is cached.
+
+    Knowledge bases shaped like the puzzles, where unit propagation and
+    components do most of the work, count in milliseconds even with
+    dozens of symbols. Loosely constrained random clauses do not split
+    up that way and take exponential time: random 3-SAT with twice as
+    many clauses as variables takes about 0.2s at 40 variables and 15s
+    at 60.
+    """
+    cnf = CNF.encode(knowledge)
+    clauses = list(set(
+        frozenset(clause) for clause in cnf.clauses
+        if not any(-literal in clause for literal in clause)
+    ))
+
+    # An empty clause can never be satisfied
+    if frozenset() in clauses:
+        return 0
+    cache = dict()
+
+    def condition(clauses, literal):
+        """Returns clauses with literal true, or None if one is falsified."""
+        conditioned = []
+        for clause in clauses:
+            if literal in clause:
+                continue
+            if -literal in clause:
+                clause = clause - {-literal}
+                if not clause:
+                    return None
+            conditioned.append(clause)
+        return conditioned
+
+    def count(clauses, variables):
+        """Counts the assignments to variables satisfying clauses."""
+
+        # Propagate unit clauses first, a round of them per pass
+        units = set(literal for clause in clauses if len(clause) == 1
+                    for literal in clause)
+        while units:
+            if any(-literal in units for literal in units):
+                return 0
+            variables -= {abs(literal) for literal in units}
+            falsified = {-literal for literal in units}
+            remaining = []
+            found = set()
+            for clause in clauses:
+                if not clause.isdisjoint(units):
+                    continue
+                if not clause.isdisjoint(falsified):
+                    clause = clause - falsified
+                    if not clause:
+                        return 0
+                    if len(clause) == 1:
+                        found.update(clause)
+                remaining.append(clause)
+            clauses = remaining
+            units = found
+
+        # Variables left in no clause may take either value
+        used = set(abs(literal) for clause in clauses for literal in clause)
+        total = 1 << len(variables - used)
+        for component in components(clauses):
+            total *= count_component(component)
+            if not total:
+                break
+        return total
+
+    def count_component(clauses):
+        """Counts the assignments to the variables of connected clauses."""
+        key = frozenset(clauses)
+        if key in cache:
+            return cache[key]
+
+        # Branch on the variable in the most clauses
+        occurrences = dict()
+        for clause in clauses:
+            for literal in clause:
+                occurrences[abs(literal)] = occurrences.get(abs(literal), 0) + 1
+        var = max(occurrences, key=occurrences.get)
+        rest = frozenset(occurrences) - {var}
+
+        cache[key] = 0
+        for literal in (var, -var):
+            conditioned = condition(clauses, literal)
+            if conditioned is not None:
+                cache[key] += count(conditioned, rest)
+        return cache[key]
+
+    def components(clauses):
+        """Splits clauses into groups connected by shared variables."""
+        containing = dict()
+        for i, clause in enumerate(clauses):
+            for literal in clause:
+                containing.setdefault(abs(literal), []).append(i)
+        grouped = set()
+        for i in range(len(clauses)):
+            if i in grouped:
+                continue
+            grouped.add(i)
+            component = [i]
+            for j in component:
+                for literal in clauses[j]:
+                    for k in containing[abs(literal)]:
+                        if k not in grouped:
+                            grouped.add(k)
+                            component.append(k)
+            yield [clauses[j] for j in component]
+
+    return count(clauses, frozenset(range(1, cnf.num_vars + 1)))
+
+
+def enumerate_check(knowledge, query):
+    """Checks entailment by enumerating every model of the symbols."""
 
     def check_all(knowledge, query, symbols, model):
         """Checks if knowledge base entails query, given a particular model."""
@@ -257,7 +954,1253 @@ def model_check(knowledge, query):
                     check_all(knowledge, query, remaining, model_false))
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    symbols = set(knowledge.symbols() | query.symbols())
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+def prune_check(knowledge, query):
+    """Checks entailment over partial models, skipping decided branches."""
+
+    # Assign the symbols that appear in the most conjuncts first
+    conjuncts = (knowledge.conjuncts if isinstance(knowledge, And)
+                 else [knowledge])
+    constraints = dict()
+    for sentence in conjuncts + [query]:
+        for symbol in sentence.symbols():
+            constraints[symbol] = constraints.get(symbol, 0) + 1
+    symbols = sorted(constraints, key=lambda s: (-constraints[s], s))
+
+    def check_all(model, i):
+        """Checks entailment in every completion of a partial model."""
+
+        # Branches where the knowledge is false or the query is true hold
+        known = knowledge.evaluate_partial(model)
+        if known is False:
+            return True
+        entailed = query.evaluate_partial(model)
+        if entailed:
+            return True
+        if known and entailed is False:
+            return False
+
+        # Otherwise try both values of the next symbol
+        p = symbols[i]
+        model[p] = True
+        holds = check_all(model, i + 1)
+        if holds:
+            model[p] = False
+            holds = check_all(model, i + 1)
+        del model[p]
+        return holds
+
+    return check_all(dict(), 0)
+
+
+def bitmask_check(knowledge, query):
+    """Checks entailment by counting through models packed into ints."""
+
+    # Give every symbol its own bit
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    index = {symbol: 1 << i for i, symbol in enumerate(symbols)}
+
+    # Every int below 2^n is a distinct model of the n symbols
+    for mask in range(1 << len(symbols)):
+        if (knowledge.evaluate_mask(mask, index)
+                and not query.evaluate_mask(mask, index)):
+            return False
+    return True
+
+
+def compiled_check(knowledge, query):
+    """Checks entailment through packed models with compiled sentences."""
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    knowledge_true = knowledge.compile(symbols)
+    query_true = query.compile(symbols)
+    for mask in range(1 << len(symbols)):
+        if knowledge_true(mask) and not query_true(mask):
+            return False
+    return True
+
+
+def numpy_check(knowledge, query):
+    """Checks entailment over the whole truth table with NumPy.
+
+    Models are packed 64 to a uint64 word. The first six symbols vary within
+    a word, the next CHUNK_BITS across the words of a chunk, and any others
+    are held fixed per chunk, so memory stays bounded as symbols are added.
+    """
+    if np is None:
+        raise ImportError("the numpy engine requires numpy")
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    columns = dict()
+
+    # Bit p of a word is the model where symbol i is true iff bit i of p is
+    for i, symbol in enumerate(symbols[:6]):
+        pattern = sum(1 << p for p in range(64) if p >> i & 1)
+        columns[symbol] = np.uint64(pattern)
+
+    # With fewer than six symbols only the first 2^n bits are models
+    if len(symbols) < 6:
+        valid = np.uint64((1 << (1 << len(symbols))) - 1)
+    else:
+        valid = np.uint64(ALL_MODELS)
+
+    inner = symbols[6:6 + CHUNK_BITS]
+    words = np.arange(1 << len(inner), dtype=np.uint64)
+    for i, symbol in enumerate(inner):
+        columns[symbol] = (words >> np.uint64(i) & np.uint64(1)) * valid
+
+    outer = symbols[6 + CHUNK_BITS:]
+    for chunk in range(1 << len(outer)):
+        for i, symbol in enumerate(outer):
+            columns[symbol] = valid if chunk >> i & 1 else np.uint64(0)
+
+        # Look for a model of the knowledge where the query is false
+        counter = (knowledge.evaluate_columns(columns)
+                   & ~query.evaluate_columns(columns) & valid)
+        if np.any(counter):
+            return False
+    return True
+
+
+def parallel_check(knowledge, query, workers=None):
+    """Checks entailment by sweeping packed models in worker processes.
+
+    Fixing the top bits of the models splits them into contiguous ranges,
+    a few per worker, which are checked with compiled sentences. Workers
+    stop as soon as any of them finds a counter-model. As with any process
+    pool, scripts using this engine need an `if __name__ == "__main__"`
+    guard on platforms that spawn workers.
+    """
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(symbols) < PARALLEL_SYMBOLS:
+        return compiled_check(knowledge, query)
+
+    # Split the models into around four ranges per worker
+    bits = min(len(symbols), (4 * workers - 1).bit_length())
+    size = 1 << (len(symbols) - bits)
+    context = multiprocessing.get_context()
+    stop = context.Event()
+    with ProcessPoolExecutor(workers, mp_context=context,
+                             initializer=start_worker,
+                             initargs=(stop,)) as executor:
+        futures = [
+            executor.submit(check_range, knowledge, query, symbols,
+                            start, start + size)
+            for start in range(0, 1 << len(symbols), size)
+        ]
+        for future in as_completed(futures):
+            if not future.result():
+                stop.set()
+                for pending in futures:
+                    pending.cancel()
+                return False
+    return True
+
+
+def start_worker(stop):
+    """Shares the stop signal with a worker process."""
+    global stop_signal
+    stop_signal = stop
+
+
+def check_range(knowledge, query, symbols, start, stop):
+    """Checks entailment over packed models from start up to stop."""
+    knowledge_true = knowledge.compile(symbols)
+    query_true = query.compile(symbols)
+    for block in range(start, stop, PARALLEL_BLOCK):
+
+        # Another worker has already found a counter-model
+        if stop_signal is not None and stop_signal.is_set():
+            return True
+        for mask in range(block, min(block + PARALLEL_BLOCK, stop)):
+            if knowledge_true(mask) and not query_true(mask):
+                return False
+    return True
+
+
+def bdd_check(knowledge, query):
+    """Checks entailment by compiling knowledge to a decision diagram."""
+    return CompiledKnowledge(knowledge).entails(query)
+
+
+def resolve_entails(knowledge, query):
+    """Checks entailment by refuting knowledge ∧ ¬query with resolution.
+
+    Follows the given-clause loop: the shortest clause not yet processed
+    is dropped if a processed clause subsumes it, otherwise it removes the
+    processed clauses it subsumes, joins them, and is resolved against
+    every processed clause with a complementary literal. Entailment holds
+    once the empty clause is derived, and fails if the clauses saturate.
+    """
+    cnf = CNF.encode(knowledge)
+    cnf.clauses.append([-cnf.literal(query)])
+
+    processed = ClauseStore()
+    seen = set()
+    unprocessed = []
+    for clause in cnf.clauses:
+        clause = frozenset(clause)
+        if clause not in seen:
+            seen.add(clause)
+            heapq.heappush(unprocessed, (len(clause), len(seen), clause))
+
+    while unprocessed:
+        _, _, given = heapq.heappop(unprocessed)
+        if not given:
+            return True
+        if processed.subsumes(given):
+            continue
+        for clause in processed.subsumed_by(given):
+            processed.remove(clause)
+        processed.add(given)
+
+        for literal in given:
+            for other in list(processed.containing(-literal)):
+                resolvent = (given - {literal}) | (other - {-literal})
+
+                # Resolvents with complementary literals are always true
+                if resolvent in seen or any(
+                        -each in resolvent for each in resolvent):
+                    continue
+                seen.add(resolvent)
+                heapq.heappush(unprocessed,
+                               (len(resolvent), len(seen), resolvent))
+    return False
+
+
+class ClauseStore():
+    """
+    Set of clauses, as frozensets of literals, indexed by literal.
+
+    The index finds the clauses to resolve on a literal, and narrows the
+    search for subsuming and subsumed clauses to those sharing a literal.
+    """
+
+    def __init__(self):
+        self.clauses = set()
+        self.index = dict()
+
+    def __len__(self):
+        return len(self.clauses)
+
+    def add(self, clause):
+        self.clauses.add(clause)
+        for literal in clause:
+            self.index.setdefault(literal, set()).add(clause)
+
+    def remove(self, clause):
+        self.clauses.discard(clause)
+        for literal in clause:
+            self.index[literal].discard(clause)
+
+    def containing(self, literal):
+        """Returns the clauses containing literal."""
+        return self.index.get(literal, ())
+
+    def subsumes(self, clause):
+        """Checks if some stored clause is a subset of clause."""
+        return any(other <= clause
+                   for literal in clause
+                   for other in self.containing(literal))
+
+    def subsumed_by(self, clause):
+        """Returns the stored clauses that are supersets of clause."""
+        lists = sorted((self.containing(literal) for literal in clause),
+                       key=len)
+        if not lists:
+            return set(self.clauses)
+        return set(other for other in lists[0] if clause <= other)
+
+
+def cdcl_check(knowledge, query):
+    """Checks entailment by refuting knowledge ∧ ¬query with a SAT solver."""
+    cnf = CNF.encode(knowledge)
+    goal = cnf.literal(query)
+    return not Solver(cnf.clauses).solve([-goal])
+
+
+class CNF():
+    """
+    Conjunctive normal form of logical sentences.
+
+    Symbols are numbered from 1, and a clause is a list of nonzero integer
+    literals where -v is the negation of variable v. Subsentences that are
+    not literals are named by auxiliary variables (Tseitin's encoding), so
+    the clauses grow linearly with the size of the sentences added.
+    """
+
+    def __init__(self):
+        self.variables = dict()
+        self.names = [None]
+        self.clauses = []
+        self.definitions = dict()
+
+    # Header of the binary form: magic, variables, names, literals
+    HEADER = struct.Struct("<4sIII")
+    MAGIC = b"CNF1"
+
+    @classmethod
+    def encode(cls, knowledge):
+        """Returns clauses for knowledge, copying them if already clauses."""
+        cnf = cls()
+        if isinstance(knowledge, CNF):
+            cnf.variables = dict(knowledge.variables)
+            cnf.names = list(knowledge.names)
+            cnf.clauses = list(knowledge.clauses)
+        else:
+            cnf.add(knowledge)
+        return cnf
+
+    @property
+    def num_vars(self):
+        return len(self.names) - 1
+
+    def to_dimacs(self):
+        """Returns the clauses in DIMACS CNF format.
+
+        Symbol names are kept in "c symbol <variable> <name>" comments.
+        """
+        lines = [f"c symbol {var} {name}"
+                 for var, name in enumerate(self.names) if name is not None]
+        lines.append(f"p cnf {self.num_vars} {len(self.clauses)}")
+        for clause in self.clauses:
+            lines.append(" ".join(str(literal) for literal in clause) + " 0")
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def from_dimacs(cls, text):
+        """Returns the clauses read from DIMACS CNF text."""
+        cnf = cls()
+        names = dict()
+        clause = []
+        for line in text.splitlines():
+            line = line.strip()
+            if line.startswith("c symbol "):
+                _, _, var, name = line.split(" ", 3)
+                names[int(var)] = name
+            elif line.startswith("p "):
+                num_vars = int(line.split()[2])
+                cnf.names = [None] * (num_vars + 1)
+            elif line.startswith("%"):
+                break
+            elif line and not line.startswith("c"):
+                for literal in map(int, line.split()):
+                    if literal:
+                        clause.append(literal)
+                    else:
+                        cnf.clauses.append(clause)
+                        clause = []
+        if clause:
+            cnf.clauses.append(clause)
+
+        # Files without a header still number their variables from 1
+        largest = max([abs(literal) for clause in cnf.clauses
+                       for literal in clause] + list(names) + [0])
+        cnf.names.extend([None] * (largest + 1 - len(cnf.names)))
+        for var, name in names.items():
+            cnf.names[var] = name
+            cnf.variables[name] = var
+        return cnf
+
+    def to_bytes(self):
+        """Returns a compact binary form of the clauses.
+
+        A header is followed by the symbol table, as (variable, length,
+        UTF-8 name) entries, and by every clause as 32-bit literals ending
+        in 0.
+        """
+        named = [(var, name.encode("utf-8"))
+                 for var, name in enumerate(self.names) if name is not None]
+        literals = []
+        for clause in self.clauses:
+            literals.extend(clause)
+            literals.append(0)
+        parts = [self.HEADER.pack(self.MAGIC, self.num_vars,
+                                  len(named), len(literals))]
+        for var, name in named:
+            parts.append(struct.pack("<II", var, len(name)) + name)
+        parts.append(struct.pack(f"<{len(literals)}i", *literals))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Returns the clauses read from the binary form of to_bytes."""
+        magic, num_vars, num_names, length = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC:
+            raise ValueError("not a binary CNF")
+        cnf = cls()
+        cnf.names = [None] * (num_vars + 1)
+        offset = cls.HEADER.size
+        for _ in range(num_names):
+            var, size = struct.unpack_from("<II", data, offset)
+            offset += 8
+            name = data[offset:offset + size].decode("utf-8")
+            offset += size
+            cnf.names[var] = name
+            cnf.variables[name] = var
+
+        # Split the literals into clauses at each 0
+        literals = struct.unpack_from(f"<{length}i", data, offset)
+        start = 0
+        for end, literal in enumerate(literals):
+            if not literal:
+                cnf.clauses.append(list(literals[start:end]))
+                start = end + 1
+        return cnf
+
+    def variable(self, name):
+        """Returns the variable numbering a symbol, creating it if needed."""
+        try:
+            return self.variables[name]
+        except KeyError:
+            self.names.append(name)
+            self.variables[name] = len(self.names) - 1
+            return self.variables[name]
+
+    def fresh(self):
+        """Returns a new auxiliary variable."""
+        self.names.append(None)
+        return len(self.names) - 1
+
+    def add(self, sentence):
+        """Adds clauses requiring sentence to be true."""
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.clauses.append(
+                [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            )
+        elif isinstance(sentence, Implication):
+            self.clauses.append([-self.literal(sentence.antecedent),
+                                 self.literal(sentence.consequent)])
+        elif isinstance(sentence, Not) and isinstance(sentence.operand, Or):
+            for disjunct in sentence.operand.disjuncts:
+                self.clauses.append([-self.literal(disjunct)])
+        elif isinstance(sentence, Not) and isinstance(sentence.operand, Not):
+            self.add(sentence.operand.operand)
+        else:
+            self.clauses.append([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """Returns a literal equivalent to sentence, defining it if needed.
+
+        And.add can change a sentence after it is defined, so a definition
+        of a sentence with an And below it is only reused while the
+        literals of its operands stay the same.
+        """
+        if isinstance(sentence, Symbol):
+            return self.variable(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        definition = self.definitions.get(id(sentence))
+        if definition is not None and (
+            definition[3] == Sentence.generation
+            or Sentence.mutable(sentence) is None
+        ):
+            return definition[1]
+
+        if isinstance(sentence, And):
+            operands = sentence.conjuncts
+        elif isinstance(sentence, Or):
+            operands = sentence.disjuncts
+        elif isinstance(sentence, Implication):
+            operands = (sentence.antecedent, sentence.consequent)
+        elif isinstance(sentence, Biconditional):
+            operands = (sentence.left, sentence.right)
+        else:
+            raise TypeError("must be a logical sentence")
+        literals = [self.literal(operand) for operand in operands]
+        if definition is not None and definition[2] == literals:
+            self.definitions[id(sentence)] = (
+                sentence, definition[1], literals, Sentence.generation
+            )
+            return definition[1]
+
+        if isinstance(sentence, (And, Or)):
+            if len(literals) == 1:
+                return literals[0]
+
+            # An Or is the negation of the And of its negated operands
+            sign = 1 if isinstance(sentence, And) else -1
+            x = self.fresh()
+            for literal in literals:
+                self.clauses.append([-x, sign * literal])
+            self.clauses.append([x] + [-sign * literal for literal in literals])
+            x *= sign
+
+        elif isinstance(sentence, Implication):
+            a, b = literals
+            x = self.fresh()
+            self.clauses.extend([[-x, -a, b], [x, a], [x, -b]])
+
+        else:
+            a, b = literals
+            x = self.fresh()
+            self.clauses.extend(
+                [[-x, -a, b], [-x, a, -b], [x, a, b], [x, -a, -b]]
+            )
+
+        # Keep the sentence alive so that its id is not reused
+        self.definitions[id(sentence)] = (
+            sentence, x, literals, Sentence.generation
+        )
+        return x
+
+
+class Solver():
+    """
+    Conflict-driven clause learning SAT solver.
+
+    Clauses are propagated with two watched literals. Every conflict is
+    analysed down to its first unique implication point, the resulting
+    clause is learned and the search backjumps to the level where it
+    becomes unit. Decisions follow VSIDS activity with phase saving, and
+    the search restarts on a geometric schedule.
+
+    Clauses may be added between calls to solve, and learned clauses are
+    kept, so one solver can answer many queries posed as assumptions.
+    """
+
+    DECAY = 0.95
+    RESTART = 100
+
+    def __init__(self, clauses=()):
+        self.values = dict()
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.watches = {0: []}
+        self.heap = []
+        self.increment = 1.0
+        self.trail = []
+        self.trail_lim = []
+        self.head = 0
+        self.ok = True
+        self.model = None
+        self.learned = 0
+        self.conflicts = 0
+        self.decisions = 0
+        for clause in clauses:
+            self.add_clause(clause)
+
+    @property
+    def num_vars(self):
+        return len(self.level) - 1
+
+    def ensure(self, var):
+        """Makes room for variables up to var."""
+        while self.num_vars < var:
+            v = len(self.level)
+            self.level.append(0)
+            self.reason.append(None)
+            self.activity.append(0.0)
+            self.phase.append(False)
+            self.watches[v] = []
+            self.watches[-v] = []
+            heapq.heappush(self.heap, (0.0, v))
+
+    def add_clause(self, clause):
+        """Adds a clause, returning False once the clauses are unsatisfiable."""
+        if not self.ok:
+            return False
+        self.cancel(0)
+
+        # Drop literals already false, and clauses already true
+        literals = []
+        for literal in clause:
+            self.ensure(abs(literal))
+            value = self.values.get(literal)
+            if value or -literal in literals:
+                return True
+            if value is None and literal not in literals:
+                literals.append(literal)
+
+        if not literals:
+            self.ok = False
+        elif len(literals) == 1:
+            self.assign(literals[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.watches[literals[0]].append(literals)
+            self.watches[literals[1]].append(literals)
+        return self.ok
+
+    def assign(self, literal, reason):
+        """Makes literal true at the current decision level."""
+        var = abs(literal)
+        self.values[literal] = True
+        self.values[-literal] = False
+        self.level[var] = len(self.trail_lim)
+        self.reason[var] = reason
+        self.trail.append(literal)
+
+    def cancel(self, level):
+        """Undoes every assignment made above decision level."""
+        if len(self.trail_lim) <= level:
+            return
+        start = self.trail_lim[level]
+        for literal in self.trail[start:]:
+            var = abs(literal)
+            self.phase[var] = literal > 0
+            del self.values[literal]
+            del self.values[-literal]
+            self.reason[var] = None
+            heapq.heappush(self.heap, (-self.activity[var], var))
+        del self.trail[start:]
+        del self.trail_lim[level:]
+        self.head = len(self.trail)
+
+    def propagate(self):
+        """Propagates unit clauses, returning a conflicting clause if any."""
+        values = self.values
+        while self.head < len(self.trail):
+            false_literal = -self.trail[self.head]
+            self.head += 1
+            watching = self.watches[false_literal]
+            kept = []
+            for i, clause in enumerate(watching):
+
+                # Keep the falsified watch in the second position
+                if clause[0] == false_literal:
+                    clause[0], clause[1] = clause[1], false_literal
+                first = clause[0]
+                if values.get(first):
+                    kept.append(clause)
+                    continue
+
+                # Look for another literal to watch
+                for k in range(2, len(clause)):
+                    if values.get(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], false_literal
+                        self.watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if values.get(first) is False:
+                        kept.extend(watching[i + 1:])
+                        self.watches[false_literal] = kept
+                        self.head = len(self.trail)
+                        return clause
+                    self.assign(first, clause)
+            self.watches[false_literal] = kept
+        return None
+
+    def analyze(self, conflict):
+        """Returns the first-UIP learned clause and its backjump level."""
+        learned = [None]
+        seen = set()
+        current = len(self.trail_lim)
+        pending = 0
+        index = len(self.trail) - 1
+        clause = conflict
+        while True:
+            for literal in clause:
+                var = abs(literal)
+                if var not in seen and self.level[var] > 0:
+                    seen.add(var)
+                    self.bump(var)
+                    if self.level[var] == current:
+                        pending += 1
+                    else:
+                        learned.append(literal)
+
+            # Resolve on the most recent literal involved in the conflict
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if not pending:
+                break
+            clause = self.reason[abs(literal)]
+        learned[0] = -literal
+
+        # Watch the literal assigned last among the rest of the clause
+        if len(learned) == 1:
+            return learned, 0
+        best = max(range(1, len(learned)),
+                   key=lambda i: self.level[abs(learned[i])])
+        learned[1], learned[best] = learned[best], learned[1]
+        return learned, self.level[abs(learned[1])]
+
+    def bump(self, var):
+        """Increases the activity of a variable involved in a conflict."""
+        self.activity[var] += self.increment
+        if self.activity[var] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[v], v)
+                         for v in range(1, len(self.level))]
+            heapq.heapify(self.heap)
+        elif var not in self.values:
+            heapq.heappush(self.heap, (-self.activity[var], var))
+
+    def decide(self):
+        """Returns the most active unassigned variable, if any."""
+        while self.heap:
+            _, var = heapq.heappop(self.heap)
+            if var not in self.values:
+                return var
+        return None
+
+    def backbone(self, literals):
+        """Returns which literals hold in every model of the clauses.
+
+        Takes a dict of literals and maps each key to True if its literal
+        is entailed, False if its negation is, and None otherwise.
+        """
+        for literal in literals.values():
+            self.ensure(abs(literal))
+        if not self.solve():
+            return {key: True for key in literals}
+
+        # Each candidate is the literal's polarity seen in every model so far
+        candidates = dict()
+        for key, literal in literals.items():
+            if self.model[abs(literal)] == (literal > 0):
+                candidates[key] = literal
+            else:
+                candidates[key] = -literal
+
+        entailed = dict()
+        for key, literal in candidates.items():
+            if key in entailed:
+                continue
+            if not self.solve([-literal]):
+                entailed[key] = literal == literals[key]
+                continue
+
+            # The new model rules out every candidate it falsifies
+            for other, candidate in candidates.items():
+                if other not in entailed and (
+                        self.model[abs(candidate)] != (candidate > 0)):
+                    entailed[other] = None
+        return entailed
+
+    def solve(self, assumptions=()):
+        """Returns whether the clauses are satisfiable under assumptions."""
+        self.model = None
+        if not self.ok:
+            return False
+        for literal in assumptions:
+            self.ensure(abs(literal))
+
+        restart = self.RESTART
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learned, level = self.analyze(conflict)
+                self.cancel(level)
+                self.learned += 1
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.watches[learned[0]].append(learned)
+                    self.watches[learned[1]].append(learned)
+                    self.assign(learned[0], learned)
+                self.increment /= self.DECAY
+                continue
+
+            if conflicts >= restart:
+                conflicts = 0
+                restart = int(restart * 1.5)
+                self.cancel(0)
+                continue
+
+            # Decide the assumptions first, one per decision level
+            level = len(self.trail_lim)
+            if level < len(assumptions):
+                literal = assumptions[level]
+                value = self.values.get(literal)
+                if value is False:
+                    self.cancel(0)
+                    return False
+                self.trail_lim.append(len(self.trail))
+                if value is None:
+                    self.assign(literal, None)
+                continue
+
+            var = self.decide()
+            if var is None:
+                self.model = {var: self.values[var]
+                              for var in range(1, len(self.level))}
+                self.cancel(0)
+                return True
+            self.decisions += 1
+            self.trail_lim.append(len(self.trail))
+            self.assign(var if self.phase[var] else -var, None)
+
+
+class KnowledgeBase(And):
+    """
+    Conjunction of sentences answered by an incremental SAT solver.
+
+    Every added sentence is encoded into the solver once. Queries are
+    solved under the assumption that they are false, so the solver keeps
+    the clauses it learned between queries and additions. model_check and
+    entailed_literals use it whenever no engine is named.
+    """
+    __slots__ = ("cnf", "solver", "watched", "generation")
+
+    def __init__(self, *conjuncts):
+        super().__init__(*conjuncts)
+        self.reset()
+
+    def __reduce__(self):
+        return (KnowledgeBase, tuple(self.conjuncts))
+
+    def add(self, conjunct):
+        super().add(conjunct)
+        self.encode(conjunct)
+
+    def reset(self):
+        """Encodes every conjunct into a new solver."""
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.watched = []
+        self.generation = Sentence.generation
+        for conjunct in self.conjuncts:
+            self.encode(conjunct)
+
+    def encode(self, sentence):
+        """Passes the clauses requiring sentence to be true to the solver.
+
+        A sentence with an And below it can change after it is encoded,
+        so its literal is kept to tell when it has.
+        """
+        self.cnf.add(sentence)
+        if Sentence.mutable(sentence) is not None:
+            self.watched.append((sentence, self.cnf.literal(sentence)))
+        self.flush()
+
+    def update(self):
+        """Encodes the conjuncts afresh if And.add has changed one."""
+        if self.generation == Sentence.generation:
+            return
+        self.generation = Sentence.generation
+        if any(self.cnf.literal(sentence) != literal
+               for sentence, literal in self.watched):
+            # The solver holds clauses of what the sentence used to say,
+            # which can contradict what it says now
+            self.reset()
+        else:
+            self.flush()
+
+    def literal(self, sentence):
+        """Returns a literal for sentence, passing its definition on."""
+        self.update()
+        literal = self.cnf.literal(sentence)
+        self.flush()
+        return literal
+
+    def flush(self):
+        """Moves newly encoded clauses into the solver."""
+        for clause in self.cnf.clauses:
+            self.solver.add_clause(clause)
+        self.cnf.clauses.clear()
+
+    def entails(self, query):
+        """Checks if the knowledge base entails query."""
+        goal = self.literal(query)
+        return not self.solver.solve([-goal])
+
+    def entailed_literals(self, symbols):
+        """Returns what the knowledge base entails about each symbol."""
+        literals = {symbol: self.literal(symbol) for symbol in symbols}
+        return self.solver.backbone(literals)
+
+
+def variable_order(knowledge):
+    """Orders the symbols of knowledge so that related ones are close.
+
+    Starts with the symbol in the most conjuncts, then repeatedly picks the
+    symbol sharing the most conjuncts with the symbols already ordered.
+    """
+    conjuncts = (knowledge.conjuncts if isinstance(knowledge, And)
+                 else [knowledge])
+    frequency = dict()
+    shared = dict()
+    for conjunct in conjuncts:
+        symbols = conjunct.symbols()
+        for symbol in symbols:
+            frequency[symbol] = frequency.get(symbol, 0) + 1
+            for other in symbols:
+                if other != symbol:
+                    pair = shared.setdefault(symbol, dict())
+                    pair[other] = pair.get(other, 0) + 1
+
+    order = []
+    score = {symbol: 0 for symbol in frequency}
+    while score:
+        symbol = max(score, key=lambda s: (score[s], frequency[s], s))
+        del score[symbol]
+        order.append(symbol)
+        for other, count in shared.get(symbol, dict()).items():
+            if other in score:
+                score[other] += count
+    return order
+
+
+class BDD():
+    """
+    Reduced ordered binary decision diagrams over one shared node table.
+
+    Nodes are ints. 0 and 1 are the false and true terminals, and every
+    other node n is the function "if variable nodes[n][0] then nodes[n][2]
+    else nodes[n][1]", where variables are numbered by their place in the
+    order. A unique table keeps the diagrams reduced, so equivalent
+    functions are the same node, and the results of ite are cached.
+    """
+
+    FALSE = 0
+    TRUE = 1
+
+    def __init__(self, order=()):
+        self.order = []
+        self.levels = dict()
+        self.nodes = [(float("inf"), 0, 0), (float("inf"), 1, 1)]
+        self.unique = dict()
+        self.cache = dict()
+        for name in order:
+            self.declare(name)
+
+    def declare(self, name):
+        """Places a symbol at the end of the order, if not yet ordered."""
+        if name not in self.levels:
+            self.levels[name] = len(self.order)
+            self.order.append(name)
+
+    def node(self, level, low, high):
+        """Returns the reduced node branching on level to low and high."""
+        if low == high:
+            return low
+        key = (level, low, high)
+        try:
+            return self.unique[key]
+        except KeyError:
+            self.nodes.append(key)
+            self.unique[key] = len(self.nodes) - 1
+            return self.unique[key]
+
+    def ite(self, f, g, h):
+        """Returns the node for "if f then g else h"."""
+        if f == self.TRUE or g == h:
+            return g
+        if f == self.FALSE:
+            return h
+        if g == self.TRUE and h == self.FALSE:
+            return f
+        key = (f, g, h)
+        if key in self.cache:
+            return self.cache[key]
+
+        # Split on the first variable of the three in the order
+        level = min(self.nodes[f][0], self.nodes[g][0], self.nodes[h][0])
+        f_low, f_high = self.cofactors(f, level)
+        g_low, g_high = self.cofactors(g, level)
+        h_low, h_high = self.cofactors(h, level)
+        result = self.node(level, self.ite(f_low, g_low, h_low),
+                           self.ite(f_high, g_high, h_high))
+        self.cache[key] = result
+        return result
+
+    def cofactors(self, u, level):
+        """Returns u with the variable at level set false, and set true."""
+        node_level, low, high = self.nodes[u]
+        if node_level == level:
+            return low, high
+        return u, u
+
+    def build(self, sentence):
+        """Returns the node for a logical sentence."""
+        built = dict()
+
+        def build(sentence):
+            if id(sentence) in built:
+                return built[id(sentence)][1]
+            if isinstance(sentence, Symbol):
+                self.declare(sentence.name)
+                u = self.node(self.levels[sentence.name],
+                              self.FALSE, self.TRUE)
+            elif isinstance(sentence, Not):
+                u = self.ite(build(sentence.operand), self.FALSE, self.TRUE)
+            elif isinstance(sentence, And):
+                u = self.TRUE
+                for conjunct in sentence.conjuncts:
+                    u = self.ite(u, build(conjunct), self.FALSE)
+            elif isinstance(sentence, Or):
+                u = self.FALSE
+                for disjunct in sentence.disjuncts:
+                    u = self.ite(u, self.TRUE, build(disjunct))
+            elif isinstance(sentence, Implication):
+                u = self.ite(build(sentence.antecedent),
+                             build(sentence.consequent), self.TRUE)
+            elif isinstance(sentence, Biconditional):
+                right = build(sentence.right)
+                u = self.ite(build(sentence.left), right,
+                             self.ite(right, self.FALSE, self.TRUE))
+            else:
+                raise TypeError("must be a logical sentence")
+
+            # Keep the sentence alive so that its id is not reused
+            built[id(sentence)] = (sentence, u)
+            return u
+
+        return build(sentence)
+
+    def count(self, u, variables=None):
+        """Returns the number of models of u over the first variables.
+
+        Counts over every ordered symbol by default; u must not depend on
+        symbols past the first variables.
+        """
+        if variables is None:
+            variables = len(self.order)
+        counted = {self.FALSE: 0, self.TRUE: 1}
+
+        def level(u):
+            """Returns the level of u, with terminals after the variables."""
+            return min(self.nodes[u][0], variables)
+
+        def count(u):
+            """Counts models of u over the variables from its level on."""
+            if u not in counted:
+                _, low, high = self.nodes[u]
+                counted[u] = sum(count(child) << (level(child) - level(u) - 1)
+                                 for child in (low, high))
+            return counted[u]
+
+        return count(u) << level(u)
+
+
+class CompiledKnowledge():
+    """
+    Knowledge base compiled once into a decision diagram.
+
+    Symbols are ordered with variable_order so that the diagram stays
+    small. Each query is then built into the same diagram and checked by
+    a single implication, with no sweep over the models. model_check and
+    entailed_literals use it whenever no engine is named.
+    """
+
+    def __init__(self, knowledge):
+        self.bdd = BDD(variable_order(knowledge))
+        self.root = self.bdd.build(knowledge)
+        self.symbols = len(self.bdd.order)
+
+    def entails(self, query):
+        """Checks if the knowledge base entails query."""
+        query = self.bdd.build(query)
+        return self.bdd.ite(self.root, query, BDD.TRUE) == BDD.TRUE
+
+    def entailed_literals(self, symbols):
+        """Returns what the knowledge base entails about each symbol."""
+        entailed = dict()
+        for symbol in symbols:
+            if self.entails(symbol):
+                entailed[symbol] = True
+            elif self.entails(Not(symbol)):
+                entailed[symbol] = False
+            else:
+                entailed[symbol] = None
+        return entailed
+
+    def count(self):
+        """Returns the number of models of the knowledge base's symbols."""
+        return self.bdd.count(self.root, self.symbols)
+
+
+class Stats():
+    """
+    Counters describing the work done by model_check.
+
+    Collected only between enable_stats and disable_stats, which swap the
+    evaluation methods for counting versions, so that the methods run
+    untouched the rest of the time.
+    """
+
+    def __init__(self):
+        self.checks = 0
+        self.models = 0
+        self.evaluations = dict()
+        self.pruned = 0
+        self.peak_depth = 0
+        self.decisions = 0
+        self.conflicts = 0
+        self.times = []
+
+        # Knowledge and query of the check in progress
+        self.knowledge = None
+        self.query = None
+        self.symbols = 0
+
+    def __str__(self):
+        lines = [
+            f"checks: {self.checks} in {sum(self.times):.6f}s",
+            f"models evaluated: {self.models}",
+            f"pruned branches: {self.pruned}",
+            f"peak recursion depth: {self.peak_depth}",
+            f"solver decisions: {self.decisions}",
+            f"solver conflicts: {self.conflicts}",
+            "evaluate() calls:",
+        ]
+        for kind, count in sorted(self.evaluations.items()):
+            lines.append(f"    {kind}: {count}")
+        return "\n".join(lines)
+
+    def as_dict(self):
+        """Returns the counters as a dict."""
+        return {
+            "checks": self.checks,
+            "models": self.models,
+            "evaluations": dict(self.evaluations),
+            "pruned": self.pruned,
+            "peak_depth": self.peak_depth,
+            "decisions": self.decisions,
+            "conflicts": self.conflicts,
+            "times": list(self.times),
+        }
+
+    def measure(self, check, knowledge, query):
+        """Runs check(knowledge, query), timing it and noting its roots."""
+        outer = (self.knowledge, self.query, self.symbols)
+        self.knowledge = knowledge
+        self.query = query
+        self.symbols = 0
+        if isinstance(knowledge, Sentence) and isinstance(query, Sentence):
+            self.symbols = len(knowledge.symbols() | query.symbols())
+        self.checks += 1
+        start = time.perf_counter()
+        try:
+            return check(knowledge, query)
+        finally:
+            self.times.append(time.perf_counter() - start)
+            self.knowledge, self.query, self.symbols = outer
+
+    def record(self, sentence, method, model, value):
+        """Counts an evaluation of sentence in model giving value."""
+        kind = type(sentence).__name__
+        self.evaluations[kind] = self.evaluations.get(kind, 0) + 1
+        if sentence is self.knowledge:
+            if method == "evaluate_columns":
+                self.models += 64 * getattr(value, "size", 1)
+            else:
+                self.models += 1
+            if method in ("evaluate", "evaluate_partial"):
+                self.peak_depth = max(self.peak_depth, len(model))
+
+        # Partial models decided before every symbol is assigned are pruned
+        if method == "evaluate_partial" and len(model) < self.symbols and (
+                (sentence is self.knowledge and value is False)
+                or (sentence is self.query and value is True)):
+            self.pruned += 1
+
+
+def enable_stats():
+    """Starts collecting statistics, returning the Stats they go into."""
+    global stats
+    if stats is not None:
+        return stats
+    stats = Stats()
+    for cls in (Symbol, Not, And, Or, Implication, Biconditional):
+        for method in ("evaluate", "evaluate_mask", "evaluate_partial",
+                       "evaluate_columns"):
+            instrumented.append((cls, method, cls.__dict__[method]))
+            setattr(cls, method, counting(cls.__dict__[method], method))
+    instrumented.append((Sentence, "compile", Sentence.compile))
+    Sentence.compile = counting_compile(Sentence.compile)
+    instrumented.append((Solver, "solve", Solver.solve))
+    Solver.solve = counting_solve(Solver.solve)
+    return stats
+
+
+def disable_stats():
+    """Stops collecting statistics, returning the Stats collected."""
+    global stats
+    while instrumented:
+        cls, method, original = instrumented.pop()
+        setattr(cls, method, original)
+    collected, stats = stats, None
+    return collected
+
+
+# Methods replaced by enable_stats, as (class, name, original method)
+instrumented = []
+
+
+def counting(evaluate, method):
+    """Returns a version of an evaluation method that records each call."""
+    def counted(self, model, *args):
+        value = evaluate(self, model, *args)
+        stats.record(self, method, model, value)
+        return value
+    return counted
+
+
+def counting_compile(compile):
+    """Returns a version of Sentence.compile counting the models checked."""
+    def counted(self, symbols):
+        function = compile(self, symbols)
+        if self is not stats.knowledge:
+            return function
+
+        def evaluate(mask):
+            stats.models += 1
+            return function(mask)
+        return evaluate
+    return counted
+
+
+def counting_solve(solve):
+    """Returns a version of Solver.solve adding up decisions and conflicts."""
+    def counted(self, assumptions=()):
+        decisions, conflicts = self.decisions, self.conflicts
+        try:
+            return solve(self, assumptions)
+        finally:
+            stats.decisions += self.decisions - decisions
+            stats.conflicts += self.conflicts - conflicts
+    return counted
+
+
+ENGINES = {
+    "enumerate": enumerate_check,
+    "bitmask": bitmask_check,
+    "compiled": compiled_check,
+    "prune": prune_check,
+    "numpy": numpy_check,
+    "parallel": parallel_check,
+    "cdcl": cdcl_check,
+    "bdd": bdd_check,
+    "resolution": resolve_entails,
+}
+
+# How entailed_literals finds literals with each engine
+LITERAL_ENGINES = {
+    "enumerate": sweep_literals,
+    "bitmask": sweep_literals,
+    "compiled": sweep_literals,
+    "prune": sweep_literals,
+    "numpy": sweep_literals,
+    "parallel": sweep_literals,
+    "cdcl": backbone_literals,
+    "bdd": bdd_literals,
+    "resolution": resolve_literals,
+}
+
+# Engines that also accept CNF clauses in place of sentences
+CLAUSE_ENGINES = ("cdcl", "resolution")
+default_engine = "enumerate"
@@ -51,6 +51,9 @@ knowledge.add(And(
     Not(Symbol("yellow3"))
 ))
 
+knowledge = simplify(knowledge)
+
+entailed = entailed_literals(knowledge, symbols)
 for symbol in symbols:
-    if model_check(knowledge, symbol):
+    if entailed[symbol]:
         print(symbol)
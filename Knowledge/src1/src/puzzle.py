@@ -50,6 +50,7 @@ knowledge.add(
     Symbol("MinervaGryffindor")
 )
 
+entailed = entailed_literals(knowledge, symbols)
 for symbol in symbols:
-    if model_check(knowledge, symbol):
+    if entailed[symbol]:
         print(symbol)